@@ -0,0 +1,115 @@
+"""
+End-to-end throughput of /process-step (one request per item) vs /process-steps (one batch request).
+
+A local HTTP server stands in for the Java MES callback endpoint; a run is finished when a
+status update has been received for every submitted item. A run fails as soon as no update has
+arrived for STALL_TIMEOUT_S (callbacks lost by the service are not retried).
+
+Usage: python benchmark_process_steps.py [number_of_items]
+"""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CALLBACK_PORT = 8765
+STALL_TIMEOUT_S = 10
+os.environ.setdefault("JAVA_MES_CALLBACK_URL", f"http://127.0.0.1:{CALLBACK_PORT}/step-update")
+os.environ.setdefault("PLC_SIMULATION_TIME_SCALE", "0.001")
+
+import python_mes_service as service
+
+received_updates = 0
+received_updates_lock = threading.Lock()
+
+
+class CallbackServer(ThreadingHTTPServer):
+    # The default listen backlog (5) resets connections when hundreds of items report at once
+    request_queue_size = 1024
+
+
+class CallbackHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        global received_updates
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with received_updates_lock:
+            received_updates += 1
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def build_steps(number_of_items):
+    product_types = [5, 6, 7, 10, 11]
+    return [
+        {
+            'mesOrderStepId': i,
+            'erpOrderItemId': 1000 + i,
+            'targetProductType': product_types[i % len(product_types)],
+            'dDate': 10 + i % 7
+        }
+        for i in range(number_of_items)
+    ]
+
+
+def wait_for_updates(expected_updates):
+    last_count = -1
+    last_progress = time.perf_counter()
+    while time.perf_counter() - last_progress < STALL_TIMEOUT_S:
+        with received_updates_lock:
+            count = received_updates
+        if count >= expected_updates:
+            return True
+        if count != last_count:
+            last_count = count
+            last_progress = time.perf_counter()
+        time.sleep(0.005)
+    return False
+
+
+def run(label, submit, steps):
+    global received_updates
+    # In-process store (no state server configured): each run starts from idle machines
+    service.machine_state_store.reset()
+    with received_updates_lock:
+        received_updates = 0
+
+    start = time.perf_counter()
+    submit(steps)
+    finished = wait_for_updates(len(steps))
+    elapsed = time.perf_counter() - start
+
+    if not finished:
+        print(f"{label:<28} FAILED: only {received_updates}/{len(steps)} updates received, "
+              f"no progress for {STALL_TIMEOUT_S}s")
+        sys.exit(1)
+    print(f"{label:<28} {len(steps)} items in {elapsed:.3f}s -> {len(steps) / elapsed:.1f} items/s")
+    return elapsed
+
+
+def submit_per_item(steps):
+    client = service.app.test_client()
+    for step in steps:
+        client.post('/process-step', json=step)
+
+
+def submit_batch(steps):
+    client = service.app.test_client()
+    client.post('/process-steps', json={'steps': steps})
+
+
+if __name__ == '__main__':
+    number_of_items = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    callback_server = CallbackServer(('127.0.0.1', CALLBACK_PORT), CallbackHandler)
+    threading.Thread(target=callback_server.serve_forever, daemon=True).start()
+
+    steps = build_steps(number_of_items)
+    per_item_elapsed = run("/process-step (per item)", submit_per_item, steps)
+    batch_elapsed = run("/process-steps (batch)", submit_batch, steps)
+    print(f"Speedup: {per_item_elapsed / batch_elapsed:.2f}x")
+
+    callback_server.shutdown()
@@ -0,0 +1,76 @@
+"""
+Load test of the production serving mode: requests/sec on /process-step at 1 vs N gunicorn workers.
+
+Usage: python benchmark_serving.py [max_workers] [duration_s] [client_threads]
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+PORT = 5099
+URL = f"http://127.0.0.1:{PORT}/process-step"
+
+
+def wait_until_ready(timeout_s=30):
+    deadline = time.perf_counter() + timeout_s
+    while time.perf_counter() < deadline:
+        try:
+            requests.post(URL, json={}, timeout=1)
+            return True
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    return False
+
+
+def hammer(duration_s, client_threads):
+    counts = [0] * client_threads
+    stop_at = time.perf_counter() + duration_s
+
+    def client(idx):
+        session = requests.Session()
+        while time.perf_counter() < stop_at:
+            response = session.post(URL, json={'mesOrderStepId': idx, 'erpOrderItemId': idx, 'targetProductType': 7}, timeout=10)
+            if response.status_code == 202:
+                counts[idx] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(client_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts) / duration_s
+
+
+def run(workers, duration_s, client_threads):
+    env = dict(os.environ,
+               MES_BIND=f"127.0.0.1:{PORT}",
+               MES_WORKERS=str(workers),
+               PLC_SIMULATION_TIME_SCALE="0",
+               JAVA_MES_CALLBACK_URL="http://127.0.0.1:9/unreachable")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "python_mes_service:app"],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_ready():
+            print(f"{workers} worker(s): server did not start")
+            return None
+        requests_per_s = hammer(duration_s, client_threads)
+        print(f"{workers} worker(s): {requests_per_s:.1f} requests/s")
+        return requests_per_s
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    duration_s = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    client_threads = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+
+    single = run(1, duration_s, client_threads)
+    multi = run(max_workers, duration_s, client_threads)
+    if single and multi:
+        print(f"Scaling 1 -> {max_workers} workers: {multi / single:.2f}x")
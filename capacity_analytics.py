@@ -0,0 +1,197 @@
+"""
+Capacity and bottleneck analytics precomputed from processing_graph and machines_tools.
+
+Everything that only depends on the cell (tool -> machines, the shortest plan of every product type,
+per-tool routing load, heads and tails of every operation) is computed once when a CapacityModel is
+built. Per-order questions then only sum a few precomputed numbers, so they can be asked on every
+incoming order (admission control, due date quoting) without running schedule_production.
+
+Bounds are taken over every subset S of tools: the operations using a tool of S can only run on the
+machines able to use one of those tools, N(S). With 6 tools that is 63 subsets, so this stays cheap
+and also catches bottlenecks made of several tools sharing the same machines.
+The bounds ignore pass-throughs on partner machines and extra tool changes, so the makespan
+bound is a true lower bound and the throughput is an upper bound (what the cell can at best sustain).
+
+The critical path and the heads/tails assume an operation starts once its predecessor has ended, as
+the service reservations do. schedule_production only waits for the predecessor to be scheduled, so
+its simulated makespans are only guaranteed to stay above load_bound.
+"""
+from parameters import processing_graph, machines_tools, TIME_TOOL_CHANGE
+from essai import get_shortest_manufacturing_plan
+
+
+class CapacityModel:
+    def __init__(self, processing_graph_data, machines_data, tool_change_time_val=TIME_TOOL_CHANGE):
+        self.tool_change_time = tool_change_time_val
+        self.machines_data = machines_data
+
+        # 1. Per-tool capacity
+        self.tools = sorted({tool for tools in machines_data.values() for tool in tools})
+        self.tool_bits = {tool: 1 << idx for idx, tool in enumerate(self.tools)}
+        self.tool_machines = {tool: sorted(name for name, tools in machines_data.items() if tool in tools)
+                              for tool in self.tools}
+
+        # Number of machines able to run at least one tool of each subset (bitmask over self.tools)
+        machine_masks = [sum(self.tool_bits[tool] for tool in tools) for tools in machines_data.values()]
+        self.subset_masks = list(range(1, 1 << len(self.tools)))
+        self.subset_machine_count = {mask: sum(1 for m_mask in machine_masks if m_mask & mask)
+                                     for mask in self.subset_masks}
+
+        # 2. Plan index: shortest plan and routing load of every reachable product type
+        self.plan_index = {}
+        for product_type_str in processing_graph_data:
+            manufacturing_plan, total_time = get_shortest_manufacturing_plan(processing_graph_data, product_type_str)
+            if not manufacturing_plan:
+                continue
+            self.plan_index[product_type_str] = self._index_plan(manufacturing_plan, total_time)
+
+    def _index_plan(self, manufacturing_plan, total_time):
+        tool_load = {}
+        # Shortest processing time before (head) and after (tail) any operation of each subset
+        subset_load = {}
+        subset_head = {}
+        subset_tail = {}
+
+        elapsed = 0
+        for step_op in manufacturing_plan:
+            tool = step_op['tool']
+            tool_load[tool] = tool_load.get(tool, 0) + step_op['time']
+            head = elapsed
+            tail = total_time - elapsed - step_op['time']
+            elapsed += step_op['time']
+
+            for mask in self.subset_masks:
+                if mask & self.tool_bits.get(tool, 0):
+                    subset_load[mask] = subset_load.get(mask, 0) + step_op['time']
+                    subset_head[mask] = min(subset_head.get(mask, head), head)
+                    subset_tail[mask] = min(subset_tail.get(mask, tail), tail)
+
+        return {
+            'plan': manufacturing_plan,
+            'total_time': total_time,
+            'tool_load': tool_load,
+            'subset_load': subset_load,
+            'subset_head': subset_head,
+            'subset_tail': subset_tail,
+        }
+
+    def _subset_tools(self, mask):
+        return [tool for tool in self.tools if mask & self.tool_bits[tool]]
+
+    def tool_capacity(self):
+        """Number of machines able to use each tool (machine-seconds per second)."""
+        return {tool: len(machine_names) for tool, machine_names in self.tool_machines.items()}
+
+    def routing_load(self, product_type_str):
+        """Processing seconds needed on each tool to produce one unit, or None if the product has no plan."""
+        plan_info = self.plan_index.get(product_type_str)
+        return dict(plan_info['tool_load']) if plan_info else None
+
+    def max_throughput_per_hour(self, product_type_str):
+        """
+        Upper bound on the units per hour the cell can sustain for a single product type.
+        Returns (units_per_hour, bottleneck_tools), or (0, []) if the product has no plan.
+        """
+        plan_info = self.plan_index.get(product_type_str)
+        if not plan_info:
+            return 0, []
+
+        best_rate = float('inf')
+        bottleneck_mask = 0
+        for mask, load in plan_info['subset_load'].items():
+            rate = 3600 * self.subset_machine_count[mask] / load
+            # Prefer the smallest subset on ties, it names the actual bottleneck
+            if rate < best_rate or (rate == best_rate and bin(mask).count('1') < bin(bottleneck_mask).count('1')):
+                best_rate = rate
+                bottleneck_mask = mask
+        return best_rate, self._subset_tools(bottleneck_mask)
+
+    def completion_lower_bound(self, product_type_str):
+        """Earliest completion time of a single unit (its plan plus one tool change), or None if it has no plan."""
+        plan_info = self.plan_index.get(product_type_str)
+        return plan_info['total_time'] + self.tool_change_time if plan_info else None
+
+    def makespan_lower_bound(self, order_details):
+        """
+        Lower bound on the makespan of an order (same format as parameters.order).
+
+        Returns a dict with:
+            lower_bound          max of critical_path_bound and capacity_bound
+            critical_path_bound  longest single plan plus one tool change
+            capacity_bound       head + tool change + load / machines + tail, worst tool subset
+            load_bound           tool change + load / machines, worst tool subset
+            bottleneck_tools     tools of the worst subset
+            unplannable_types    product types of the order without a plan (not in the bounds)
+        """
+        subset_load = {}
+        subset_head = {}
+        subset_tail = {}
+        critical_path_bound = 0
+        unplannable_types = []
+
+        for item in order_details['orders']:
+            product_type_str = 'P' + str(item['type'])
+            plan_info = self.plan_index.get(product_type_str)
+            if not plan_info:
+                unplannable_types.append(product_type_str)
+                continue
+            if item['quantity'] <= 0:
+                continue
+
+            critical_path_bound = max(critical_path_bound, self.completion_lower_bound(product_type_str))
+            for mask, load in plan_info['subset_load'].items():
+                subset_load[mask] = subset_load.get(mask, 0) + load * item['quantity']
+                subset_head[mask] = min(subset_head.get(mask, float('inf')), plan_info['subset_head'][mask])
+                subset_tail[mask] = min(subset_tail.get(mask, float('inf')), plan_info['subset_tail'][mask])
+
+        capacity_bound = 0
+        load_bound = 0
+        bottleneck_mask = 0
+        for mask, load in subset_load.items():
+            subset_work = self.tool_change_time + load / self.subset_machine_count[mask]
+            load_bound = max(load_bound, subset_work)
+            bound = subset_head[mask] + subset_work + subset_tail[mask]
+            if bound > capacity_bound:
+                capacity_bound = bound
+                bottleneck_mask = mask
+
+        return {
+            'lower_bound': max(critical_path_bound, capacity_bound),
+            'critical_path_bound': critical_path_bound,
+            'capacity_bound': capacity_bound,
+            'load_bound': load_bound,
+            'bottleneck_tools': self._subset_tools(bottleneck_mask),
+            'unplannable_types': unplannable_types,
+        }
+
+    def bottleneck_report(self):
+        """Per product type: routing load, sustainable units per hour and bottleneck tools."""
+        report = {}
+        for product_type_str, plan_info in self.plan_index.items():
+            units_per_hour, bottleneck_tools = self.max_throughput_per_hour(product_type_str)
+            report[product_type_str] = {
+                'tool_load': dict(plan_info['tool_load']),
+                'units_per_hour': units_per_hour,
+                'bottleneck_tools': bottleneck_tools,
+            }
+        return report
+
+
+def display_capacity_summary(capacity_model):
+    print("\n--- Tool Capacity ---")
+    for tool, machine_count in capacity_model.tool_capacity().items():
+        print(f"{tool:<5} | {machine_count} machines | {', '.join(capacity_model.tool_machines[tool])}")
+
+    print("\n--- Sustainable Throughput per Product Type ---")
+    print(f"{'Product':<8} | {'Units/hour':>10} | {'Bottleneck':<15} | Routing load (s/unit)")
+    for product_type_str, info in capacity_model.bottleneck_report().items():
+        load_str = ', '.join(f"{tool}: {load}" for tool, load in sorted(info['tool_load'].items()))
+        print(f"{product_type_str:<8} | {info['units_per_hour']:>10.1f} | {'+'.join(info['bottleneck_tools']):<15} | {load_str}")
+
+
+if __name__ == '__main__':
+    from parameters import order
+
+    model = CapacityModel(processing_graph, machines_tools, TIME_TOOL_CHANGE)
+    display_capacity_summary(model)
+    print(f"\nMakespan lower bound for order {order['orderID']}: {model.makespan_lower_bound(order)}")
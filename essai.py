@@ -1,4 +1,5 @@
 from parameters import *
+from profiling import run_profiled
 
 
 def get_shortest_manufacturing_plan(graph, target_piece, raw_materials=['P1', 'P2']):
@@ -138,6 +139,10 @@ def generate_all_product_instances(order, processing_graph):
     return product_instances
 
 def schedule_production(order_details, processing_graph_data, machines_data, tool_change_time_val=30):
+    return run_profiled(f"schedule_production-order{order_details.get('orderID')}", _schedule_production,
+                        order_details, processing_graph_data, machines_data, tool_change_time_val)
+
+def _schedule_production(order_details, processing_graph_data, machines_data, tool_change_time_val, profiler):
     global TIME_TOOL_CHANGE # Ensure we are using the global or passed-in one
     TIME_TOOL_CHANGE = tool_change_time_val
     
@@ -150,6 +155,7 @@ def schedule_production(order_details, processing_graph_data, machines_data, too
     for inst in product_instances_to_produce:
         for task in inst['tasks']:
             all_tasks_dict[task['task_id']] = task
+    profiler.lap('plan_generation')
 
     if not all_tasks_dict:
         print("No tasks generated for the order.")
@@ -160,6 +166,7 @@ def schedule_production(order_details, processing_graph_data, machines_data, too
 
     # 2. Main loop
     while len(completed_task_ids) < len(all_tasks_dict):
+        profiler.lap('time_advance')
         ready_tasks = []
         for task_id, task in all_tasks_dict.items():
             if task['status'] == 'pending':
@@ -172,6 +179,7 @@ def schedule_production(order_details, processing_graph_data, machines_data, too
                     task['status'] = 'ready'
                     # Append a copy if you modify it directly, or append task itself if modification is fine
                     ready_tasks.append(task) 
+        profiler.lap('ready_set_rebuild')
         
         if not ready_tasks: # No tasks are ready to be scheduled
             all_tasks_done = True # Assume all tasks are done unless a machine is busy or tasks are pending/not done
@@ -199,6 +207,7 @@ def schedule_production(order_details, processing_graph_data, machines_data, too
 
 
         ready_tasks.sort(key=lambda t: (t['final_product_ddate'], t['product_instance_id'], t['task_id']))
+        profiler.lap('ready_sort')
 
         task_scheduled_in_this_iteration = False
         for task_to_schedule in ready_tasks:
@@ -223,6 +232,7 @@ def schedule_production(order_details, processing_graph_data, machines_data, too
                     max(current_time, m_sort.busy_until) # Then by earliest availability
                 )
             )
+            profiler.lap('machine_sort')
 
             for machine_candidate in candidate_machines_sorted:
                 machine_name = machine_candidate.name
@@ -273,6 +283,7 @@ def schedule_production(order_details, processing_graph_data, machines_data, too
                         mia_partner_for_best_mib = None
                         mia_passthrough_start_for_best_mib = -1
                         mia_passthrough_end_for_best_mib = -1
+            profiler.lap('candidate_evaluation')
 
             if best_machine_for_task:
                 # Assign task to best_machine_for_task
@@ -301,6 +312,7 @@ def schedule_production(order_details, processing_graph_data, machines_data, too
                 # Consider breaking from 'for task_to_schedule in ready_tasks' to re-evaluate ready_tasks
                 # or let it try to schedule other ready tasks at the same current_time.
                 # Current logic tries to fill current_time as much as possible.
+            profiler.lap('task_assignment')
 
         if not task_scheduled_in_this_iteration and len(completed_task_ids) < len(all_tasks_dict):
             # If no task was scheduled in this iteration, and tasks still remain,
@@ -319,6 +331,7 @@ def schedule_production(order_details, processing_graph_data, machines_data, too
                 # print(f"WARNING: Deadlock or unfulfillable tasks at time {current_time}. Remaining tasks: {len(all_tasks_dict) - len(completed_task_ids)}")
                 break # Exit loop
 
+    profiler.lap('time_advance')
     # 3. Results analysis
     print("\n--- Scheduling Finished ---")
     total_makespan = 0
@@ -367,6 +380,7 @@ def schedule_production(order_details, processing_graph_data, machines_data, too
             p_inst['status'] = 'incomplete'
             print(f"Product {p_inst['id']} (Type: {p_inst['type']}) -> INCOMPLETE ({completed_instance_tasks_count}/{num_instance_tasks} tasks completed)")
 
+    profiler.lap('result_analysis')
     return scheduled_history, product_instances_to_produce
 
 
@@ -0,0 +1,29 @@
+"""
+Production serving mode for the Python MES service.
+
+    gunicorn -c gunicorn.conf.py python_mes_service:app
+
+The master process starts the machine state server before forking the workers, so every
+worker reserves machines against the same shared state.
+Environment: MES_BIND (default 0.0.0.0:5001), MES_WORKERS (default: number of CPUs),
+MES_THREADS (threads per worker, default 4).
+"""
+import multiprocessing
+import os
+
+from machine_state_server import start_state_server
+
+bind = os.environ.get("MES_BIND", "0.0.0.0:5001")
+workers = int(os.environ.get("MES_WORKERS", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("MES_THREADS", "4"))
+# Workers must import the app after the state server address is exported
+preload_app = False
+
+
+def on_starting(server):
+    server.machine_state_manager = start_state_server()
+
+
+def on_exit(server):
+    server.machine_state_manager.shutdown()
@@ -0,0 +1,232 @@
+"""
+Machine reservation state shared by every worker of the Python MES service.
+
+In development (single process) the store lives in the service process. When the service
+runs with several workers, one local state process owns the store and the workers talk to
+it through a multiprocessing manager, so they all reserve against the same busy_until/current_tool
+values instead of each keeping its own copy.
+"""
+import os
+import threading
+from multiprocessing.managers import BaseManager
+
+from parameters import machines_tools, TIME_TOOL_CHANGE
+
+STATE_SERVER_ADDRESS_ENV = "MES_STATE_SERVER_ADDRESS"
+STATE_SERVER_AUTHKEY_ENV = "MES_STATE_SERVER_AUTHKEY"
+
+
+class MachineStateStore:
+    def __init__(self, machines_data):
+        self.machines_data = machines_data
+        self.lock = threading.Lock()
+        self.machine_states = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.machine_states = {}
+            for machine_name, tools_list in self.machines_data.items():
+                self.machine_states[machine_name] = {
+                    "name": machine_name,
+                    "available_tools": set(tools_list),
+                    "current_tool": None,
+                    "busy_until": 0,
+                    "down": False,
+                    # End of the last operation that ran to completion (released reservations never go below it)
+                    "committed_until": 0,
+                    "reservations": [],
+                }
+
+    def reserve_operation(self, operation_detail, current_sequence_time_s, owner=None, excluded_machines=None):
+        """
+        Selects the machine finishing the operation the earliest and reserves it.
+        Selection and reservation happen under the same lock, so concurrent workers never
+        pick the same free slot. Machines that are down or listed in excluded_machines are skipped.
+        The reservation is recorded under 'owner' so that it can be released later.
+        Returns (machine_name, start_time, end_time, tool_changed) or (None, -1, -1, False).
+        """
+        required_tool = operation_detail['tool']
+        processing_time_s = operation_detail['time']
+
+        with self.lock:
+            best_machine_name = None
+            earliest_op_finish_time_s = float('inf')
+            actual_op_start_time_s_for_best = -1
+            tool_change_occurred_for_best = False
+
+            candidate_machine_names = [name for name, m_data in self.machine_states.items()
+                                       if required_tool in m_data["available_tools"]
+                                       and not m_data["down"]
+                                       and not (excluded_machines and name in excluded_machines)]
+
+            # Sort by: 1. Tool already mounted, 2. Earliest free
+            candidate_machine_names.sort(key=lambda m_name:
+                                         (0 if self.machine_states[m_name]["current_tool"] == required_tool else 1,
+                                          self.machine_states[m_name]["busy_until"]))
+
+            for machine_name in candidate_machine_names:
+                machine_free_at_s = self.machine_states[machine_name]["busy_until"]
+                potential_op_start_on_machine_s = max(current_sequence_time_s, machine_free_at_s)
+
+                tool_change_duration_s = 0
+                if self.machine_states[machine_name]["current_tool"] != required_tool:
+                    tool_change_duration_s = TIME_TOOL_CHANGE
+
+                actual_processing_begins_s = potential_op_start_on_machine_s + tool_change_duration_s
+                current_candidate_op_finish_s = actual_processing_begins_s + processing_time_s
+
+                if current_candidate_op_finish_s < earliest_op_finish_time_s:
+                    earliest_op_finish_time_s = current_candidate_op_finish_s
+                    actual_op_start_time_s_for_best = actual_processing_begins_s
+                    best_machine_name = machine_name
+                    tool_change_occurred_for_best = (tool_change_duration_s > 0)
+
+            if not best_machine_name:
+                return None, -1, -1, False
+
+            if tool_change_occurred_for_best:
+                self.machine_states[best_machine_name]["current_tool"] = required_tool
+            self.machine_states[best_machine_name]["busy_until"] = earliest_op_finish_time_s
+            self.machine_states[best_machine_name]["reservations"].append({
+                "owner": owner,
+                "start_time": actual_op_start_time_s_for_best,
+                "end_time": earliest_op_finish_time_s,
+                "started": False,
+            })
+            return best_machine_name, actual_op_start_time_s_for_best, earliest_op_finish_time_s, tool_change_occurred_for_best
+
+    def _refresh_busy_until(self, machine_name):
+        m_data = self.machine_states[machine_name]
+        m_data["busy_until"] = max([m_data["committed_until"]] + [r["end_time"] for r in m_data["reservations"]])
+
+    def complete_reservation(self, machine_name, owner):
+        """Forgets the reservation of a finished operation; the machine stays busy until its end."""
+        return self._commit_reservation(machine_name, owner)
+
+    def abort_reservation(self, machine_name, owner):
+        """
+        Forgets the reservation of an operation that ran and failed. Unlike release_reservation, the
+        machine stays busy until its end: the slot was used and its tool is mounted.
+        """
+        return self._commit_reservation(machine_name, owner)
+
+    def _commit_reservation(self, machine_name, owner):
+        with self.lock:
+            m_data = self.machine_states[machine_name]
+            for reservation in m_data["reservations"]:
+                if reservation["owner"] == owner:
+                    m_data["reservations"].remove(reservation)
+                    m_data["committed_until"] = max(m_data["committed_until"], reservation["end_time"])
+                    return True
+            return False
+
+    def start_reservation(self, machine_name, owner):
+        """
+        Marks a reservation as running, so that machine-down events leave it in place.
+        Returns False if the machine is down or the reservation was released (the operation must be rerouted).
+        """
+        with self.lock:
+            m_data = self.machine_states[machine_name]
+            if m_data["down"]:
+                return False
+            for reservation in m_data["reservations"]:
+                if reservation["owner"] == owner:
+                    reservation["started"] = True
+                    return True
+            return False
+
+    def is_reservation_live(self, machine_name, owner):
+        """True if the reservation still exists and its machine is up."""
+        with self.lock:
+            m_data = self.machine_states[machine_name]
+            return not m_data["down"] and any(r["owner"] == owner for r in m_data["reservations"])
+
+    def release_reservation(self, machine_name, owner):
+        """Gives back the slot of an operation that will not run on this machine."""
+        with self.lock:
+            m_data = self.machine_states[machine_name]
+            for reservation in m_data["reservations"]:
+                if reservation["owner"] == owner:
+                    m_data["reservations"].remove(reservation)
+                    self._refresh_busy_until(machine_name)
+                    return True
+            return False
+
+    def set_machine_down(self, machine_name, from_time_s, horizon_s):
+        """
+        Marks a machine as down and releases its reservations overlapping the window
+        [from_time_s, from_time_s + horizon_s]. Running reservations and reservations beyond the
+        window are left in place; the latter are repaired when their operation is about to run.
+        Returns the released reservations.
+        """
+        with self.lock:
+            m_data = self.machine_states[machine_name]
+            m_data["down"] = True
+            window_end_s = from_time_s + horizon_s
+            released = [r for r in m_data["reservations"]
+                        if not r["started"] and r["end_time"] > from_time_s and r["start_time"] < window_end_s]
+            m_data["reservations"] = [r for r in m_data["reservations"] if r not in released]
+            self._refresh_busy_until(machine_name)
+            return released
+
+    def set_machine_up(self, machine_name):
+        with self.lock:
+            self.machine_states[machine_name]["down"] = False
+
+
+class MachineStateManager(BaseManager):
+    pass
+
+
+_shared_store = None
+
+
+def _get_shared_store():
+    global _shared_store
+    if _shared_store is None:
+        _shared_store = MachineStateStore(machines_tools)
+    return _shared_store
+
+
+MachineStateManager.register('get_store', callable=_get_shared_store)
+
+
+def _parse_address(address_str):
+    host, port = address_str.rsplit(':', 1)
+    return host, int(port)
+
+
+def _authkey():
+    # Manager connections unpickle their input, so the key must stay secret: it is only passed to forked workers
+    authkey_hex = os.environ.get(STATE_SERVER_AUTHKEY_ENV)
+    if not authkey_hex:
+        raise RuntimeError(f"{STATE_SERVER_AUTHKEY_ENV} must be set to connect to the machine state server")
+    return bytes.fromhex(authkey_hex)
+
+
+def start_state_server(address_str="127.0.0.1:0"):
+    """
+    Starts the local state process and exports its address and a random authkey in the environment,
+    so that worker processes forked afterwards connect to it.
+    Returns the started manager (keep a reference to it for as long as workers run).
+    """
+    os.environ[STATE_SERVER_AUTHKEY_ENV] = os.urandom(32).hex()
+    manager = MachineStateManager(address=_parse_address(address_str), authkey=_authkey())
+    manager.start()
+    host, port = manager.address
+    os.environ[STATE_SERVER_ADDRESS_ENV] = f"{host}:{port}"
+    print(f"[Python-State] Machine state server started on {host}:{port}")
+    return manager
+
+
+def get_machine_state_store():
+    """Returns a proxy to the shared store if a state server is configured, else an in-process store."""
+    address_str = os.environ.get(STATE_SERVER_ADDRESS_ENV)
+    if not address_str:
+        return MachineStateStore(machines_tools)
+
+    manager = MachineStateManager(address=_parse_address(address_str), authkey=_authkey())
+    manager.connect()
+    print(f"[Python-State] Connected to machine state server at {address_str}")
+    return manager.get_store()
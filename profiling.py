@@ -0,0 +1,161 @@
+"""
+Opt-in profiling of scheduling runs and service requests.
+
+Enabled with the MES_PROFILE=1 environment variable or the --profile command line flag.
+Each profiled run writes into MES_PROFILE_DIR (default: ./profiles):
+    <run_name>.pstats    cProfile output (open with `python -m pstats` or snakeviz, or turn it
+                         into a flame graph with flameprof / gprof2dot)
+    <run_name>.txt       per-phase wall time, call counts and tracemalloc allocation deltas
+
+tracemalloc only has process-wide counters: allocation deltas and the traced peak include every
+thread of the process, so they are only specific to a run if no other run overlapped it (the
+summary says whether one did).
+
+Code is instrumented either with `with profiler.phase(name):` blocks or, in long loops, with
+`profiler.lap(name)` calls that charge the time since the previous lap to `name`.
+Use run_profiled() to run a function with a profiler that is stopped even if the function raises.
+When profiling is off, the profiler is a no-op: phase() hands back a shared null context and lap()
+returns immediately, so instrumented code only pays for a method call.
+"""
+import contextlib
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+PROFILING_ENABLED = os.environ.get("MES_PROFILE", "0").lower() in ("1", "true", "yes") or "--profile" in sys.argv
+PROFILE_OUTPUT_DIR = os.environ.get("MES_PROFILE_DIR", "profiles")
+
+_NULL_PHASE = contextlib.nullcontext()
+_run_counter = 0
+_run_counter_lock = threading.Lock()
+# Running profilers, guarded by _run_counter_lock
+_active_runs = set()
+
+
+class NullRunProfiler:
+    enabled = False
+
+    def phase(self, phase_name):
+        return _NULL_PHASE
+
+    def lap(self, phase_name):
+        pass
+
+    def stop(self):
+        return None
+
+
+class RunProfiler:
+    enabled = True
+
+    def __init__(self, run_name):
+        global _run_counter
+        with _run_counter_lock:
+            _run_counter += 1
+            run_number = _run_counter
+            self.overlapped = bool(_active_runs)
+            for active_run in _active_runs:
+                active_run.overlapped = True
+            _active_runs.add(self)
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # The peak is process-wide: resetting it while another run is active would corrupt that run's peak
+            if not self.overlapped:
+                tracemalloc.reset_peak()
+        self.run_name = f"{re.sub(r'[^A-Za-z0-9_.-]', '_', run_name)}-{os.getpid()}-{run_number}"
+        self.phase_times = {}
+        self.phase_calls = {}
+        self.phase_allocated_bytes = {}
+        self.profile = cProfile.Profile()
+        self.profile_active = False
+        self.start_memory, _ = tracemalloc.get_traced_memory()
+        self.start_time = time.perf_counter()
+        self.last_lap_memory = self.start_memory
+        self.last_lap_time = self.start_time
+        try:
+            self.profile.enable()
+            self.profile_active = True
+        except ValueError:
+            # Another profiler is already running in this interpreter (e.g. a concurrent request)
+            print(f"[Python-Profile] cProfile busy, only phase timers are recorded for {self.run_name}")
+
+    @contextlib.contextmanager
+    def phase(self, phase_name):
+        memory_before, _ = tracemalloc.get_traced_memory()
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            memory_after, _ = tracemalloc.get_traced_memory()
+            self._record(phase_name, time.perf_counter() - phase_start, memory_after - memory_before)
+
+    def lap(self, phase_name):
+        """Charges the time and allocations since the previous lap (or the start of the run) to phase_name."""
+        now = time.perf_counter()
+        memory_now, _ = tracemalloc.get_traced_memory()
+        self._record(phase_name, now - self.last_lap_time, memory_now - self.last_lap_memory)
+        self.last_lap_time = now
+        self.last_lap_memory = memory_now
+
+    def _record(self, phase_name, elapsed, allocated_bytes):
+        self.phase_times[phase_name] = self.phase_times.get(phase_name, 0.0) + elapsed
+        self.phase_calls[phase_name] = self.phase_calls.get(phase_name, 0) + 1
+        self.phase_allocated_bytes[phase_name] = self.phase_allocated_bytes.get(phase_name, 0) + allocated_bytes
+
+    def stop(self):
+        """Stops the run and writes its pstats and phase summary. Returns the summary file path."""
+        if self.profile_active:
+            self.profile.disable()
+        total_time = time.perf_counter() - self.start_time
+        end_memory, peak_memory = tracemalloc.get_traced_memory()
+        with _run_counter_lock:
+            _active_runs.discard(self)
+
+        os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+        base_path = os.path.join(PROFILE_OUTPUT_DIR, self.run_name)
+        if self.profile_active:
+            self.profile.dump_stats(base_path + ".pstats")
+
+        lines = [
+            f"Run: {self.run_name}",
+            f"Total wall time: {total_time * 1000:.3f}ms",
+            f"Net allocated: {end_memory - self.start_memory} bytes, traced peak: {peak_memory} bytes",
+            "Allocations and peak are process-wide: " + (
+                "other runs overlapped this one, they include their allocations (the peak may predate this run)"
+                if self.overlapped else "no other run overlapped this one"),
+            "",
+            f"{'Phase':<25} | {'Calls':>8} | {'Time (ms)':>12} | {'% of run':>8} | {'Allocated (bytes)':>18}",
+            "-" * 83,
+        ]
+        for phase_name, phase_time in sorted(self.phase_times.items(), key=lambda p: -p[1]):
+            share = phase_time / total_time * 100 if total_time > 0 else 0
+            lines.append(f"{phase_name:<25} | {self.phase_calls[phase_name]:>8} | {phase_time * 1000:>12.3f} | "
+                         f"{share:>7.1f}% | {self.phase_allocated_bytes[phase_name]:>18}")
+
+        with open(base_path + ".txt", "w") as summary_file:
+            summary_file.write("\n".join(lines) + "\n")
+        print(f"[Python-Profile] Wrote {base_path}.txt" + (f" and {base_path}.pstats" if self.profile_active else ""))
+        return base_path + ".txt"
+
+
+_NULL_RUN_PROFILER = NullRunProfiler()
+
+
+def start_run_profiler(run_name):
+    """Returns a started RunProfiler if profiling is enabled, else the shared no-op profiler."""
+    if not PROFILING_ENABLED:
+        return _NULL_RUN_PROFILER
+    return RunProfiler(run_name)
+
+
+def run_profiled(run_name, func, *args):
+    """Calls func(*args, profiler) and returns its result; the profiler is stopped even if func raises."""
+    profiler = start_run_profiler(run_name)
+    try:
+        return func(*args, profiler)
+    finally:
+        profiler.stop()
@@ -5,84 +5,163 @@ import random
 import datetime
 import requests
 import os
+import uuid
 
-from parameters import processing_graph, machines_tools, TIME_TOOL_CHANGE, MACHINE_PARTNERS, PASS_THROUGH_DURATION_ON_A
+from parameters import processing_graph, machines_tools, TIME_TOOL_CHANGE
 from essai import get_shortest_manufacturing_plan
+from machine_state_server import get_machine_state_store
+from profiling import run_profiled
+from capacity_analytics import CapacityModel
 
 app = Flask(__name__)
 
 JAVA_MES_CALLBACK_URL = os.environ.get("JAVA_MES_CALLBACK_URL", "http://localhost:8081/api/mes/scheduling-callback/step-update")
+# Scales the simulated PLC work (1.0 = real operation time, 0 = no sleep, useful for benchmarks)
+PLC_SIMULATION_TIME_SCALE = float(os.environ.get("PLC_SIMULATION_TIME_SCALE", "1.0"))
+# Rolling-horizon repair: only reservations within REPAIR_HORIZON_S (simulated seconds) of a machine-down
+# event are rerouted right away, and a repair never spends more than REPAIR_TIME_BUDGET_MS of wall time
+REPAIR_HORIZON_S = float(os.environ.get("REPAIR_HORIZON_S", "600"))
+REPAIR_TIME_BUDGET_MS = float(os.environ.get("REPAIR_TIME_BUDGET_MS", "50"))
+MAX_REPAIR_ATTEMPTS = int(os.environ.get("MAX_REPAIR_ATTEMPTS", "2"))
+
+# Local store in a single process, proxy to the shared state process when running with several workers
+machine_state_store = get_machine_state_store()
+
+# Plans only depend on the target product type, so they are computed once and shared by all requests
+manufacturing_plan_cache = {}
+manufacturing_plan_cache_lock = threading.Lock()
+
+# Serializes whole-batch reservation passes against each other, within this process only: with several
+# workers, reservations made by other workers can interleave with a batch pass (each operation is still
+# reserved atomically by the state store)
+batch_reservation_lock = threading.Lock()
+
+# Batch items whose operations are still running, by owner token, so that machine-down events can reroute them.
+# Reservations are owned by (owner_token, op_idx): the token is generated per request/item, as MES step IDs
+# are not guaranteed to be unique across in-flight requests
+active_batch_items = {}
+repair_lock = threading.Lock()
+
+# Precomputed once, answers admission/due date questions without running a schedule
+capacity_model = CapacityModel(processing_graph, machines_tools, TIME_TOOL_CHANGE)
+
+callback_session = requests.Session()
+
+
+def get_cached_manufacturing_plan(target_product_str):
+    """Returns the (plan_steps, total_time) for a target product, computing it only on first use."""
+    cached_plan = manufacturing_plan_cache.get(target_product_str)
+    if cached_plan is not None:
+        return cached_plan
+    with manufacturing_plan_cache_lock:
+        if target_product_str not in manufacturing_plan_cache:
+            if target_product_str in processing_graph:
+                manufacturing_plan_cache[target_product_str] = get_shortest_manufacturing_plan(processing_graph, target_product_str)
+            else:
+                manufacturing_plan_cache[target_product_str] = (None, float('inf'))
+        return manufacturing_plan_cache[target_product_str]
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def select_machine_and_calculate_times(operation_detail, current_sequence_time_s, owner=None, excluded_machines=None):
+    return machine_state_store.reserve_operation(operation_detail, current_sequence_time_s, owner, excluded_machines)
+
+
+def reroute_item_operations(item, from_op_index, excluded_machines, repair_deadline):
+    """
+    Moves the reserved operations of a batch item, starting at from_op_index, to other tool-capable machines.
+
+    Only the invalidated part of the item's plan is touched: the operation at from_op_index, then each
+    following one as long as it would start before its rerouted predecessor ends, or its reservation was
+    released or sits on a down machine. excluded_machines only applies to the operation at from_op_index.
+    Must be called with repair_lock held, and never on an operation that has already started (a failed
+    operation must be aborted first, so that the slot it used is not given back).
+    Returns False if an operation could not be placed or the repair ran out of time.
+    """
+    reservations = item['reservations']
+    previous_end_s = reservations[from_op_index - 1]['end_time'] if from_op_index > 0 else 0
+
+    for op_index in range(from_op_index, len(reservations)):
+        reservation = reservations[op_index]
+        if (op_index > from_op_index and reservation['start_time'] >= previous_end_s
+                and machine_state_store.is_reservation_live(reservation['machine'], reservation['owner'])):
+            break
+        if time.perf_counter() > repair_deadline:
+            return False
+
+        machine_state_store.release_reservation(reservation['machine'], reservation['owner'])
+        selected_machine, op_actual_start_s, op_actual_end_s, tool_changed = select_machine_and_calculate_times(
+            reservation['operation'],
+            previous_end_s,
+            owner=reservation['owner'],
+            excluded_machines=excluded_machines if op_index == from_op_index else None
+        )
+        if not selected_machine:
+            return False
+
+        print(f"[Python-Repair] MES_ID {item['mes_order_step_id']}: Op {reservation['operation']['to_piece']} moved "
+              f"{reservation['machine']} -> {selected_machine}. Est. Start: {op_actual_start_s}s, Est. End: {op_actual_end_s}s")
+        reservation.update(machine=selected_machine, start_time=op_actual_start_s,
+                           end_time=op_actual_end_s, tool_changed=tool_changed)
+        previous_end_s = op_actual_end_s
 
-python_scheduler_machine_states = {}
-machine_locks = {}
+    return True
 
-def initialize_python_machine_states():
-    global python_scheduler_machine_states, machine_locks
-    for machine_name, tools_list in machines_tools.items():
-        python_scheduler_machine_states[machine_name] = {
-            "name": machine_name,
-            "available_tools": set(tools_list),
-            "current_tool": None,
-            "busy_until": 0,
-        }
-        machine_locks[machine_name] = threading.Lock()
-    print("[Python-Init] Initialized Python internal machine states for simulation.")
 
-initialize_python_machine_states()
-
-
-def select_machine_and_calculate_times(operation_detail, current_sequence_time_s):
-    required_tool = operation_detail['tool']
-    processing_time_s = operation_detail['time']
-    
-    best_machine_name = None
-    earliest_op_finish_time_s = float('inf')
-    actual_op_start_time_s_for_best = -1
-    tool_change_occurred_for_best = False
-
-    candidate_machine_names = []
-    for name, m_data in python_scheduler_machine_states.items():
-        if required_tool in m_data["available_tools"]:
-            candidate_machine_names.append(name)
-
-    # Sort by: 1. Tool already mounted, 2. Earliest free
-    candidate_machine_names.sort(key=lambda m_name:
-                                 (0 if python_scheduler_machine_states[m_name]["current_tool"] == required_tool else 1,
-                                  python_scheduler_machine_states[m_name]["busy_until"]))
-
-    for machine_name in candidate_machine_names:
-        
-        machine_free_at_s = python_scheduler_machine_states[machine_name]["busy_until"]
-        potential_op_start_on_machine_s = max(current_sequence_time_s, machine_free_at_s)
-        
-        tool_change_duration_s = 0
-        if python_scheduler_machine_states[machine_name]["current_tool"] != required_tool:
-            tool_change_duration_s = TIME_TOOL_CHANGE
-            
-        actual_processing_begins_s = potential_op_start_on_machine_s + tool_change_duration_s
-        current_candidate_op_finish_s = actual_processing_begins_s + processing_time_s
-
-        if current_candidate_op_finish_s < earliest_op_finish_time_s:
-            earliest_op_finish_time_s = current_candidate_op_finish_s
-            actual_op_start_time_s_for_best = actual_processing_begins_s
-            best_machine_name = machine_name
-            tool_change_occurred_for_best = (tool_change_duration_s > 0)
-
-    if best_machine_name:
-        with machine_locks[best_machine_name]:
-            if tool_change_occurred_for_best:
-                python_scheduler_machine_states[best_machine_name]["current_tool"] = required_tool
-            python_scheduler_machine_states[best_machine_name]["busy_until"] = earliest_op_finish_time_s
-        return best_machine_name, actual_op_start_time_s_for_best, earliest_op_finish_time_s, tool_change_occurred_for_best
-    else:
-        return None, -1, -1, False
+def repair_after_machine_down(machine_name, from_time_s):
+    """
+    Marks a machine as down and reroutes the batch operations reserved on it inside the repair horizon.
+    Operations beyond the horizon (or owned by another worker) are rerouted when they are about to run.
+    Returns (number_of_rerouted_items, number_of_unrepaired_items).
+    """
+    repair_started = time.perf_counter()
+    repair_deadline = repair_started + REPAIR_TIME_BUDGET_MS / 1000
+    released_reservations = machine_state_store.set_machine_down(machine_name, from_time_s, REPAIR_HORIZON_S)
+
+    released_op_indexes = {}
+    for released in released_reservations:
+        owner_token, op_index = released['owner']
+        released_op_indexes.setdefault(owner_token, []).append(op_index)
+
+    rerouted_items = 0
+    unrepaired_items = 0
+    with repair_lock:
+        for owner_token, op_indexes in released_op_indexes.items():
+            item = active_batch_items.get(owner_token)
+            # Items of other workers (and per-item requests) repair themselves when about to run
+            if item is None:
+                continue
+            # Reroute from the lowest released operation; a later one is only rerouted again if the
+            # first reroute stopped before reaching it. Operations already started were rerouted by
+            # their executor meanwhile.
+            item_repaired = True
+            for op_index in sorted(op_indexes):
+                reservation = item['reservations'][op_index]
+                if (op_index <= item['started_op_index']
+                        or machine_state_store.is_reservation_live(reservation['machine'], reservation['owner'])):
+                    continue
+                if not reroute_item_operations(item, op_index, None, repair_deadline):
+                    item_repaired = False
+                    break
+            if item_repaired:
+                rerouted_items += 1
+            else:
+                unrepaired_items += 1
+
+    print(f"[Python-Repair] Machine {machine_name} down: {len(released_reservations)} reservations released, "
+          f"{rerouted_items} items rerouted, {unrepaired_items} left for lazy repair "
+          f"in {(time.perf_counter() - repair_started) * 1000:.2f}ms")
+    return rerouted_items, unrepaired_items
 
 
 def opcua_simulation_for_plc_step(machine_name, tool_name, from_piece, to_piece, plc_processing_time_s):
     """Simulates the OPC-UA interaction and PLC processing time."""
     print(f"[Python-OPCUA-SIM] Machine: {machine_name}, Tool: {tool_name}, Op: {from_piece}->{to_piece}, Simulating {plc_processing_time_s}s PLC work...")
     
-    time.sleep(plc_processing_time_s)
+    time.sleep(plc_processing_time_s * PLC_SIMULATION_TIME_SCALE)
 
     if random.random() < 0.02:
         print(f"[Python-OPCUA-SIM] *** SIMULATED PLC STEP FAILURE for {to_piece} on {machine_name} ***")
@@ -93,13 +172,19 @@ def opcua_simulation_for_plc_step(machine_name, tool_name, from_piece, to_piece,
 
 
 def background_processing_and_callback(data_from_java_mes):
+    run_profiled(f"process-step-{data_from_java_mes.get('mesOrderStepId')}", process_step_and_callback, data_from_java_mes)
+
+
+def process_step_and_callback(data_from_java_mes, profiler):
     mes_order_step_id = data_from_java_mes.get('mesOrderStepId')
     erp_order_item_id = data_from_java_mes.get('erpOrderItemId')
     target_product_str = 'P' + str(data_from_java_mes.get('targetProductType'))
 
     print(f"[Python-BG] Starting background processing for MES Step ID: {mes_order_step_id}, Target: {target_product_str}")
 
-    manufacturing_plan_steps, _ = get_shortest_manufacturing_plan(processing_graph, target_product_str)
+    owner_token = uuid.uuid4().hex
+    with profiler.phase('plan_lookup'):
+        manufacturing_plan_steps, _ = get_cached_manufacturing_plan(target_product_str)
 
     final_status = "FAILED"
     final_message = f"Processing for MES Step {mes_order_step_id} failed."
@@ -118,35 +203,60 @@ def background_processing_and_callback(data_from_java_mes):
         for op_idx, operation_detail in enumerate(manufacturing_plan_steps):
             print(f"[Python-BG] MES_ID {mes_order_step_id}: Attempting Op {op_idx+1} ({operation_detail['from_piece']}->{operation_detail['to_piece']} with {operation_detail['tool']})")
             
-            selected_machine, op_actual_start_s, op_actual_end_s, tool_changed = select_machine_and_calculate_times(
-                operation_detail,
-                current_product_instance_time_s
-            )
-
-            if not selected_machine:
-                final_message = f"Could not find/reserve machine for op {operation_detail['tool']} for {operation_detail['to_piece']} (MES Step: {mes_order_step_id})"
-                print(f"[Python-BG] {final_message}")
-                all_ops_succeeded_for_this_product = False
-                break
-            
-            print(f"[Python-BG] MES_ID {mes_order_step_id}: Op {operation_detail['to_piece']} assigned to {selected_machine}. "
-                  f"Est. Start: {op_actual_start_s}s, Est. End: {op_actual_end_s}s. ToolChange: {tool_changed}")
-
-            operation_time_s = operation_detail['time']
-            plc_step_succeeded = opcua_simulation_for_plc_step(
-                selected_machine,
-                operation_detail['tool'],
-                operation_detail['from_piece'],
-                operation_detail['to_piece'],
-                operation_time_s
-            )
+            owner = (owner_token, op_idx)
+            failed_machines = set()
+            plc_step_succeeded = False
+
+            # A failed operation releases its machine and is retried on another tool-capable machine
+            while not plc_step_succeeded and len(failed_machines) <= MAX_REPAIR_ATTEMPTS:
+                with profiler.phase('reservation'):
+                    selected_machine, op_actual_start_s, op_actual_end_s, tool_changed = select_machine_and_calculate_times(
+                        operation_detail,
+                        current_product_instance_time_s,
+                        owner=owner,
+                        excluded_machines=failed_machines
+                    )
+
+                if not selected_machine:
+                    break
+
+                # Started reservations are left in place by machine-down events; if the machine went
+                # down since it was reserved, the operation moves to another machine
+                if not machine_state_store.start_reservation(selected_machine, owner):
+                    final_message = f"Machine {selected_machine} went down before op {operation_detail['to_piece']} started (MES Step: {mes_order_step_id})"
+                    print(f"[Python-BG] {final_message}")
+                    machine_state_store.release_reservation(selected_machine, owner)
+                    failed_machines.add(selected_machine)
+                    continue
+
+                print(f"[Python-BG] MES_ID {mes_order_step_id}: Op {operation_detail['to_piece']} assigned to {selected_machine}. "
+                      f"Est. Start: {op_actual_start_s}s, Est. End: {op_actual_end_s}s. ToolChange: {tool_changed}")
+
+                operation_time_s = operation_detail['time']
+                with profiler.phase('plc_execution'):
+                    plc_step_succeeded = opcua_simulation_for_plc_step(
+                        selected_machine,
+                        operation_detail['tool'],
+                        operation_detail['from_piece'],
+                        operation_detail['to_piece'],
+                        operation_time_s
+                    )
+
+                if plc_step_succeeded:
+                    machine_state_store.complete_reservation(selected_machine, owner)
+                else:
+                    final_message = f"Simulated PLC operation failed for {operation_detail['to_piece']} on {selected_machine} (MES Step: {mes_order_step_id})"
+                    print(f"[Python-BG] {final_message}")
+                    machine_state_store.abort_reservation(selected_machine, owner)
+                    failed_machines.add(selected_machine)
 
             if not plc_step_succeeded:
-                final_message = f"Simulated PLC operation failed for {operation_detail['to_piece']} on {selected_machine} (MES Step: {mes_order_step_id})"
-                print(f"[Python-BG] {final_message}")
+                if not selected_machine and not failed_machines:
+                    final_message = f"Could not find/reserve machine for op {operation_detail['tool']} for {operation_detail['to_piece']} (MES Step: {mes_order_step_id})"
+                    print(f"[Python-BG] {final_message}")
                 all_ops_succeeded_for_this_product = False
-                break 
-            
+                break
+
             current_product_instance_time_s = op_actual_end_s
             final_timestamp = datetime.datetime.fromtimestamp(time.time() - START_TIME_EPOCH + op_actual_end_s) if op_actual_end_s > 0 else datetime.datetime.now()
 
@@ -164,9 +274,15 @@ def background_processing_and_callback(data_from_java_mes):
         "errorMessage": final_message if final_status == "FAILED" else None
     }
 
+    with profiler.phase('callback'):
+        send_step_update_to_java_mes(result_payload)
+
+
+def send_step_update_to_java_mes(result_payload):
+    mes_order_step_id = result_payload.get('mesOrderStepId')
     print(f"[Python-BG] Sending update to Java MES: {result_payload}")
     try:
-        response = requests.post(JAVA_MES_CALLBACK_URL, json=result_payload, timeout=15)
+        response = callback_session.post(JAVA_MES_CALLBACK_URL, json=result_payload, timeout=15)
         response.raise_for_status()
         print(f"[Python-BG] Java MES callback successful for {mes_order_step_id}. Status: {response.status_code}")
     except requests.exceptions.RequestException as e_req:
@@ -175,6 +291,154 @@ def background_processing_and_callback(data_from_java_mes):
         print(f"[Python-BG] Generic error during Java MES callback for {mes_order_step_id}: {e_gen}")
 
 
+def reserve_machines_for_batch(batch_items, profiler):
+    """
+    Reserves machines for every operation of every item of a batch in a single pass.
+
+    Items are handled by due date (then by their position in the request), so that the most
+    urgent items get the earliest machine slots. Each item gets a 'reservations' list
+    (one entry per operation) or an 'error' message if it could not be planned/reserved.
+    """
+    ordered_items = sorted(batch_items, key=lambda item: (item['due_date'], item['batch_index']))
+    profiler.lap('batch_sort')
+
+    with batch_reservation_lock:
+        for item in ordered_items:
+            manufacturing_plan_steps, _ = get_cached_manufacturing_plan(item['target_product'])
+            item['reservations'] = []
+            if not manufacturing_plan_steps:
+                item['error'] = f"No manufacturing plan found for {item['target_product']} (MES Step: {item['mes_order_step_id']})"
+                continue
+
+            current_product_instance_time_s = 0
+            for op_idx, operation_detail in enumerate(manufacturing_plan_steps):
+                owner = (item['owner_token'], op_idx)
+                selected_machine, op_actual_start_s, op_actual_end_s, tool_changed = select_machine_and_calculate_times(
+                    operation_detail,
+                    current_product_instance_time_s,
+                    owner=owner
+                )
+                if not selected_machine:
+                    item['error'] = f"Could not find/reserve machine for op {operation_detail['tool']} for {operation_detail['to_piece']} (MES Step: {item['mes_order_step_id']})"
+                    # Give back the operations reserved so far, the item will not run
+                    for reservation in item['reservations']:
+                        machine_state_store.release_reservation(reservation['machine'], reservation['owner'])
+                    item['reservations'] = []
+                    break
+                item['reservations'].append({
+                    'owner': owner,
+                    'operation': operation_detail,
+                    'machine': selected_machine,
+                    'start_time': op_actual_start_s,
+                    'end_time': op_actual_end_s,
+                    'tool_changed': tool_changed
+                })
+                current_product_instance_time_s = op_actual_end_s
+
+    profiler.lap('batch_reservation')
+    return ordered_items
+
+
+def execute_reserved_item_and_callback(item, profiler):
+    """Runs the already reserved operations of one batch item on the PLC simulation and reports the result."""
+    mes_order_step_id = item['mes_order_step_id']
+    final_status = "FAILED"
+    final_message = item.get('error') or f"Processing for MES Step {mes_order_step_id} failed."
+    final_timestamp = datetime.datetime.now()
+
+    if 'error' in item:
+        print(f"[Python-Batch] {final_message}")
+    else:
+        all_ops_succeeded_for_this_product = True
+        failed_machines = set()
+        op_idx = 0
+        while op_idx < len(item['reservations']):
+            with repair_lock:
+                # Reservations on a down machine, or released by a machine-down event that could not
+                # reroute them (repair budget, other worker, machine back up since), are rerouted now
+                reservation = item['reservations'][op_idx]
+                if not machine_state_store.start_reservation(reservation['machine'], reservation['owner']):
+                    repair_deadline = time.perf_counter() + REPAIR_TIME_BUDGET_MS / 1000
+                    if (not reroute_item_operations(item, op_idx, failed_machines, repair_deadline)
+                            or not machine_state_store.start_reservation(reservation['machine'], reservation['owner'])):
+                        final_message = f"Could not reroute op {reservation['operation']['to_piece']} away from machine {reservation['machine']} (MES Step: {mes_order_step_id})"
+                        print(f"[Python-Batch] {final_message}")
+                        all_ops_succeeded_for_this_product = False
+                        break
+                item['started_op_index'] = op_idx
+                reservation = dict(item['reservations'][op_idx])
+
+            operation_detail = reservation['operation']
+            with profiler.phase('plc_execution'):
+                plc_step_succeeded = opcua_simulation_for_plc_step(
+                    reservation['machine'],
+                    operation_detail['tool'],
+                    operation_detail['from_piece'],
+                    operation_detail['to_piece'],
+                    operation_detail['time']
+                )
+            if not plc_step_succeeded:
+                final_message = f"Simulated PLC operation failed for {operation_detail['to_piece']} on {reservation['machine']} (MES Step: {mes_order_step_id})"
+                print(f"[Python-Batch] {final_message}")
+                # The failed run used its slot: keep the machine busy until its end before rerouting
+                machine_state_store.abort_reservation(reservation['machine'], reservation['owner'])
+                failed_machines.add(reservation['machine'])
+                if len(failed_machines) > MAX_REPAIR_ATTEMPTS:
+                    all_ops_succeeded_for_this_product = False
+                    break
+                with repair_lock, profiler.phase('repair'):
+                    # The failed operation has not started on its new machine yet
+                    item['started_op_index'] = op_idx - 1
+                    repair_deadline = time.perf_counter() + REPAIR_TIME_BUDGET_MS / 1000
+                    if not reroute_item_operations(item, op_idx, failed_machines, repair_deadline):
+                        all_ops_succeeded_for_this_product = False
+                        break
+                continue
+
+            machine_state_store.complete_reservation(reservation['machine'], reservation['owner'])
+            op_idx += 1
+            # Like the per-item path, the retry budget applies to each operation separately
+            failed_machines = set()
+            op_actual_end_s = reservation['end_time']
+            final_timestamp = datetime.datetime.fromtimestamp(time.time() - START_TIME_EPOCH + op_actual_end_s) if op_actual_end_s > 0 else datetime.datetime.now()
+
+        if all_ops_succeeded_for_this_product:
+            final_status = "COMPLETED"
+            final_message = f"MES Step {mes_order_step_id} processing simulated as COMPLETED."
+
+        with repair_lock:
+            # Give back the slots of the operations that will not run anymore
+            for reservation in item['reservations'][op_idx:]:
+                machine_state_store.release_reservation(reservation['machine'], reservation['owner'])
+            active_batch_items.pop(item['owner_token'], None)
+
+    with profiler.phase('callback'):
+        send_step_update_to_java_mes({
+            "mesOrderStepId": mes_order_step_id,
+            "erpOrderItemId": item['erp_order_item_id'],
+            "status": final_status,
+            "timestamp": final_timestamp.isoformat(),
+            "errorMessage": final_message if final_status == "FAILED" else None
+        })
+
+
+def background_batch_processing(batch_items):
+    ordered_items = run_profiled(f"process-steps-batch-{len(batch_items)}", reserve_machines_for_batch, batch_items)
+    print(f"[Python-Batch] Reserved machines for {len(ordered_items)} items in one pass.")
+    with repair_lock:
+        for item in ordered_items:
+            if 'error' not in item:
+                active_batch_items[item['owner_token']] = item
+    # Each item reports back as soon as it finishes, so the Java MES receives a stream of updates.
+    # Items mostly wait on PLC time, so they all run at once (as with /process-step) instead of
+    # queueing behind a bounded pool
+    for item in ordered_items:
+        thread = threading.Thread(target=run_profiled,
+                                  args=(f"process-steps-item-{item['mes_order_step_id']}", execute_reserved_item_and_callback, item))
+        thread.daemon = True
+        thread.start()
+
+
 @app.route('/process-step', methods=['POST'])
 def process_step_endpoint():
     data = request.json
@@ -190,6 +454,118 @@ def process_step_endpoint():
     return jsonify({"message": "Processing initiated for MES Step ID: " + str(data.get('mesOrderStepId'))}), 202
 
 
+@app.route('/process-steps', methods=['POST'])
+def process_steps_endpoint():
+    data = request.json
+    if not data or not isinstance(data.get('steps'), list):
+        return jsonify({"error": "Missing required field 'steps' (list of {mesOrderStepId, erpOrderItemId, targetProductType})"}), 400
+
+    batch_items = []
+    rejected = []
+    for batch_index, step in enumerate(data['steps']):
+        if not isinstance(step, dict) or 'mesOrderStepId' not in step or 'erpOrderItemId' not in step or 'targetProductType' not in step:
+            rejected.append({"index": batch_index, "error": "Missing required fields (mesOrderStepId, erpOrderItemId, targetProductType)"})
+            continue
+        if 'dDate' in step and not is_number(step['dDate']):
+            rejected.append({"index": batch_index, "error": "dDate must be a number"})
+            continue
+        batch_items.append({
+            'batch_index': batch_index,
+            'mes_order_step_id': step['mesOrderStepId'],
+            'erp_order_item_id': step['erpOrderItemId'],
+            'target_product': 'P' + str(step['targetProductType']),
+            'due_date': step.get('dDate', float('inf')),
+            'owner_token': uuid.uuid4().hex,
+            'started_op_index': -1
+        })
+
+    print(f"[Python-Flask] Received /process-steps request with {len(data['steps'])} steps ({len(rejected)} rejected)")
+
+    if batch_items:
+        thread = threading.Thread(target=background_batch_processing, args=(batch_items,))
+        thread.daemon = True
+        thread.start()
+
+    return jsonify({
+        "message": f"Processing initiated for {len(batch_items)} MES Steps",
+        "accepted": [item['mes_order_step_id'] for item in batch_items],
+        "rejected": rejected
+    }), 202
+
+
+@app.route('/machine-event', methods=['POST'])
+def machine_event_endpoint():
+    data = request.json
+    if not data or 'machine' not in data or data.get('event') not in ('down', 'up'):
+        return jsonify({"error": "Missing required fields (machine, event: 'down' or 'up')"}), 400
+    if data['machine'] not in machines_tools:
+        return jsonify({"error": f"Unknown machine {data['machine']}"}), 404
+    if 'atTime' in data and not is_number(data['atTime']):
+        return jsonify({"error": "atTime must be a number"}), 400
+
+    print(f"[Python-Flask] Received /machine-event request: {data}")
+
+    if data['event'] == 'up':
+        machine_state_store.set_machine_up(data['machine'])
+        return jsonify({"message": f"Machine {data['machine']} is up"}), 200
+
+    rerouted_items, unrepaired_items = repair_after_machine_down(data['machine'], data.get('atTime', 0))
+    return jsonify({
+        "message": f"Machine {data['machine']} is down",
+        "reroutedItems": rerouted_items,
+        "unrepairedItems": unrepaired_items
+    }), 200
+
+
+@app.route('/capacity-quote', methods=['POST'])
+def capacity_quote_endpoint():
+    data = request.json
+    if not data or not isinstance(data.get('orders'), list):
+        return jsonify({"error": "Missing required field 'orders' (list of {type, quantity, dDate})"}), 400
+    for item in data['orders']:
+        if not isinstance(item, dict) or 'type' not in item or 'quantity' not in item:
+            return jsonify({"error": "Each order line needs 'type' and 'quantity'"}), 400
+        if not isinstance(item['quantity'], int) or isinstance(item['quantity'], bool):
+            return jsonify({"error": "quantity must be an integer"}), 400
+        if 'dDate' in item and not is_number(item['dDate']):
+            return jsonify({"error": "dDate must be a number"}), 400
+
+    bounds = capacity_model.makespan_lower_bound(data)
+    # dDate is in minutes, like in the ERP orders
+    due_dates_s = [item['dDate'] * 60 for item in data['orders'] if 'dDate' in item]
+    latest_due_date_s = max(due_dates_s) if due_dates_s else None
+
+    # Each line on its own: no unit can be finished before its plan plus one tool change
+    infeasible_lines = []
+    for line_index, item in enumerate(data['orders']):
+        product_type_str = 'P' + str(item['type'])
+        line_bound_s = capacity_model.completion_lower_bound(product_type_str)
+        if 'dDate' not in item or item['quantity'] <= 0 or line_bound_s is None:
+            continue
+        if line_bound_s > item['dDate'] * 60:
+            infeasible_lines.append({
+                "lineIndex": line_index,
+                "type": item['type'],
+                "dDate": item['dDate'],
+                "completionLowerBound": line_bound_s,
+                "earliestQuotableDueDate": line_bound_s / 60
+            })
+
+    return jsonify({
+        "makespanLowerBound": bounds['lower_bound'],
+        "criticalPathBound": bounds['critical_path_bound'],
+        "capacityBound": bounds['capacity_bound'],
+        "bottleneckTools": bounds['bottleneck_tools'],
+        "unplannableTypes": bounds['unplannable_types'],
+        # False means that whatever the schedule, some product will be finished after its due date
+        # (the order-wide bound exceeds the latest due date, or a line cannot meet its own)
+        "dueDateFeasible": None if latest_due_date_s is None else (bounds['lower_bound'] <= latest_due_date_s
+                                                                    and not infeasible_lines),
+        "infeasibleLines": infeasible_lines,
+        "earliestQuotableDueDate": bounds['lower_bound'] / 60
+    }), 200
+
+
 START_TIME_EPOCH = time.time()
 
 if __name__ == '__main__':